@@ -10,6 +10,7 @@ setup(
     author_email='florent.monjalet@gmail.com',
     package_dir = {'': 'src'},
     packages=['hexlighter'],
+    install_requires=['numpy'],
     scripts=['scripts/hexlighter']
 )
 
@@ -0,0 +1,292 @@
+import multiprocessing
+import random
+
+import numpy as np
+
+# Marks the positions past the end of a line in a prefix matrix
+absent = -1
+
+mersenne_prime = (1 << 31) - 1
+
+
+def prefix_matrix(lines, prefix):
+    """Builds the matrix of the @prefix first bytes of @lines (a list of str).
+
+    Return:
+        (matrix, lengths): an int16 numpy array of shape
+        (len(@lines), @prefix), padded with absent, and the numpy array of the
+        (whole) line lengths.
+    """
+    matrix = np.full((len(lines), prefix), absent, dtype=np.int16)
+    lengths = np.zeros(len(lines), dtype=np.int64)
+    for i, line in enumerate(lines):
+        lengths[i] = len(line)
+        line = line[:prefix]
+        matrix[i, :len(line)] = np.frombuffer(line, dtype=np.uint8)
+    return matrix, lengths
+
+
+def distances(a, alen, b, blen):
+    """Returns the distances between the rows of two prefix matrices (see
+    prefix_matrix), row i of @a being compared with row i of @b.
+
+    The distance is the number of differing bytes over the aligned prefix, plus
+    the length difference, over the longest length (cut to the prefix, plus the
+    length difference beyond it): 0 for equal lines, 1 for lines that have
+    nothing in common. Bytes past the prefix are only compared by length, so
+    that two lines sharing their prefix but not their length still differ.
+    """
+    prefix = a.shape[-1]
+    # absent bytes differ from present ones, so the length difference inside
+    # the prefix is counted along with the differing bytes.
+    differ = np.count_nonzero(a != b, axis=1)
+    cut_a, cut_b = np.minimum(alen, prefix), np.minimum(blen, prefix)
+    beyond = np.abs(alen - blen) - np.abs(cut_a - cut_b)
+    longest = np.maximum(cut_a, cut_b) + beyond
+    return (differ + beyond) / np.maximum(longest, 1).astype(np.float64)
+
+
+class MinHasher(object):
+    """Computes MinHash signatures of lines and their LSH band keys.
+
+    A line is seen as the set of its (offset, byte) pairs, so that the Jaccard
+    similarity of two lines decreases with the number of differing bytes over
+    their aligned prefix and with their length difference. Two lines share a
+    band key with a probability of J^@rows for each of the @bands bands.
+    """
+
+    def __init__(self, bands=16, rows=2, seed=0):
+        self.bands = bands
+        self.rows = rows
+        rng = np.random.RandomState(seed)
+        n = bands * rows
+        self.a = rng.randint(1, mersenne_prime, n).astype(np.int64)
+        self.b = rng.randint(0, mersenne_prime, n).astype(np.int64)
+
+    def signatures(self, matrix):
+        """Returns the (n, bands * rows) MinHash signatures of the lines of a
+        prefix matrix."""
+        offsets = np.arange(matrix.shape[1], dtype=np.int64) * 256
+        features = offsets + matrix
+        present = matrix != absent
+        sig = np.empty((matrix.shape[0], len(self.a)), dtype=np.int64)
+        for i in range(len(self.a)):
+            h = (self.a[i] * features + self.b[i]) % mersenne_prime
+            h[~present] = mersenne_prime
+            sig[:, i] = h.min(axis=1)
+        return sig
+
+    def band_keys(self, matrix):
+        """Returns the (n, bands) LSH band keys of the lines of a prefix
+        matrix."""
+        sig = self.signatures(matrix).reshape(-1, self.bands, self.rows)
+        keys = np.zeros(sig.shape[:2], dtype=np.int64)
+        for r in range(self.rows):
+            keys = keys * mersenne_prime + sig[:, :, r]
+        return keys
+
+
+class UnionFind(object):
+    """Minimal union-find over integers [0, n)."""
+
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, x):
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, x, y):
+        self.parent[self.find(x)] = self.find(y)
+
+
+class Clusterer(object):
+    """Groups lines into message types.
+
+    Types are found on a sample of the lines: LSH gives candidate pairs of
+    similar lines (instead of comparing all the pairs), which are linked when
+    their distance is under @max_dist. The medoid of each group then
+    represents its type, groups whose medoids are under @max_dist of each
+    other being merged. Every line is then assigned to the closest medoid
+    among its LSH candidates. There are at most @max_clusters clusters.
+
+    Attributes:
+        @medoids: list of line indexes, the medoid of each cluster
+    """
+
+    def __init__(self, max_dist=0.3, prefix=64, max_clusters=1024,
+                 max_medoid_sample=64):
+        self.max_dist = max_dist
+        self.prefix = prefix
+        self.max_clusters = max_clusters
+        self.max_medoid_sample = max_medoid_sample
+        self.hasher = MinHasher()
+        self.medoids = []
+        self.matrix = np.zeros((0, prefix), dtype=np.int16)
+        self.lengths = np.zeros(0, dtype=np.int64)
+        self.keys = np.zeros((0, self.hasher.bands), dtype=np.int64)
+
+    def fit(self, indexes, lines):
+        """Finds the medoids of the clusters of a sample of lines.
+
+        Args:
+            @indexes: the line index of each line of the sample
+            @lines: the sample, a list of str
+        """
+        matrix, lengths = prefix_matrix(lines, self.prefix)
+        keys = self.hasher.band_keys(matrix)
+        uf = UnionFind(len(lines))
+        for band in range(self.hasher.bands):
+            # link every line to the first line sharing its key
+            _, first, inverse = np.unique(keys[:, band], return_index=True,
+                                          return_inverse=True)
+            leader = first[inverse]
+            others = np.flatnonzero(leader != np.arange(len(lines)))
+            d = distances(matrix[others], lengths[others],
+                          matrix[leader[others]], lengths[leader[others]])
+            for i in others[d <= self.max_dist]:
+                uf.union(i, leader[i])
+        groups = {}
+        for i in range(len(lines)):
+            groups.setdefault(uf.find(i), []).append(i)
+        groups = self._merge(matrix, lengths, groups.values())
+        groups.sort(key=len, reverse=True)
+        for members in groups[:self.max_clusters]:
+            m = self._medoid(matrix, lengths, members)
+            self._add_medoid(indexes[m], matrix[m], lengths[m], keys[m])
+
+    def assign(self, matrix, lengths):
+        """Assigns lines to the closest medoid among their LSH candidates.
+
+        Args:
+            @matrix, @lengths: a prefix matrix of the lines (see prefix_matrix)
+
+        Return:
+            (cluster, dist): numpy arrays of the cluster number and distance
+            of each line, cluster being -1 for lines further than max_dist from
+            all their candidates.
+        """
+        n = len(matrix)
+        cluster = np.full(n, -1, dtype=np.int32)
+        dist = np.full(n, np.inf)
+        if not n or not self.medoids:
+            return cluster, dist
+        keys = self.hasher.band_keys(matrix)
+        for band in range(self.hasher.bands):
+            mkeys = self.keys[:, band]
+            order = np.argsort(mkeys)
+            pos = np.searchsorted(mkeys[order], keys[:, band])
+            pos = np.minimum(pos, len(order) - 1)
+            lines = np.flatnonzero(mkeys[order][pos] == keys[:, band])
+            cands = order[pos[lines]]
+            d = distances(matrix[lines], lengths[lines],
+                          self.matrix[cands], self.lengths[cands])
+            better = d < dist[lines]
+            dist[lines[better]] = d[better]
+            cluster[lines[better]] = cands[better]
+        cluster[dist > self.max_dist] = -1
+        return cluster, dist
+
+    def add_outlier(self, index, line):
+        """Assigns one line that matched no medoid in assign by comparing it
+        with every medoid, and makes it a new medoid if none is close enough
+        and there are less than max_clusters clusters.
+
+        Return:
+            the cluster number of the line, -1 if it has none
+        """
+        matrix, lengths = prefix_matrix([line], self.prefix)
+        d = distances(self.matrix, self.lengths, matrix, lengths)
+        if len(d) and d.min() <= self.max_dist:
+            return int(np.argmin(d))
+        if len(self.medoids) >= self.max_clusters:
+            return -1
+        self._add_medoid(index, matrix[0], lengths[0],
+                         self.hasher.band_keys(matrix)[0])
+        return len(self.medoids) - 1
+
+    def _medoid(self, matrix, lengths, members):
+        """Returns the member of @members closest to all the others (on a
+        sample of at most max_medoid_sample members)."""
+        if len(members) > self.max_medoid_sample:
+            members = random.Random(len(members)).sample(members,
+                                                         self.max_medoid_sample)
+        members = np.array(members)
+        sub, sublen = matrix[members], lengths[members]
+        total = np.zeros(len(members))
+        for i in range(len(members)):
+            total[i] = distances(sub, sublen, sub[i], sublen[i]).sum()
+        return members[np.argmin(total)]
+
+    def _merge(self, matrix, lengths, groups):
+        """Merges the groups (lists of members) whose medoids are under
+        max_dist of each other. Members are only linked to the first line of
+        their LSH buckets, so one type can otherwise be split in many groups.
+
+        Return:
+            the list of merged groups
+        """
+        groups = sorted(groups, key=len, reverse=True)
+        merged = []
+        rows = np.empty((len(groups), self.prefix), dtype=matrix.dtype)
+        rowlen = np.empty(len(groups), dtype=lengths.dtype)
+        for members in groups:
+            m = self._medoid(matrix, lengths, members)
+            k = len(merged)
+            if k:
+                d = distances(rows[:k], rowlen[:k], matrix[m], lengths[m])
+                closest = np.argmin(d)
+                if d[closest] <= self.max_dist:
+                    merged[closest].extend(members)
+                    continue
+            rows[k], rowlen[k] = matrix[m], lengths[m]
+            merged.append(list(members))
+        return merged
+
+    def _add_medoid(self, index, row, length, keys):
+        self.medoids.append(index)
+        self.matrix = np.vstack((self.matrix, row))
+        self.lengths = np.append(self.lengths, length)
+        self.keys = np.vstack((self.keys, keys))
+
+
+_worker_clusterer = None
+_worker_decode = None
+
+def _init_worker(clusterer, decode):
+    global _worker_clusterer, _worker_decode
+    _worker_clusterer = clusterer
+    _worker_decode = decode
+
+def _assign_chunk(lines):
+    if _worker_decode is not None:
+        lines = [_worker_decode(line) for line in lines]
+    matrix, lengths = prefix_matrix(lines, _worker_clusterer.prefix)
+    return _worker_clusterer.assign(matrix, lengths)[0]
+
+
+def assign_all(clusterer, chunks, jobs=1, decode=None):
+    """Assigns the lines of every chunk of @chunks (an iterable of lists of
+    str) with @clusterer, using @jobs processes. If given, @decode converts
+    each line to its bytes (str) in the worker processes, so that decoding is
+    spread over them too.
+
+    Return:
+        a numpy array of the cluster number of each line, -1 for unassigned
+        lines.
+    """
+    if jobs > 1:
+        pool = multiprocessing.Pool(jobs, _init_worker, (clusterer, decode))
+        results = list(pool.imap(_assign_chunk, chunks))
+        pool.close()
+        pool.join()
+    else:
+        _init_worker(clusterer, decode)
+        results = [_assign_chunk(chunk) for chunk in chunks]
+    if not results:
+        return np.zeros(0, dtype=np.int32)
+    return np.concatenate(results)
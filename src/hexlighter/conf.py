@@ -2,6 +2,8 @@ import argparse
 from collections import OrderedDict
 import os
 
+from hexlighter.transform import TransformChain
+
 class ConfParam(object):
     """ Represent a global parameter of a program """
     def __init__(self, name, shortname="", type=bool, nargs=0, help="",
@@ -62,6 +64,41 @@ opt['highlight'] = ConfParam('highlight', shortname="l", type=int,
                     help="Highlights @size bytes from @offset")
 opt['cycle']     = ConfParam('cycle', type=int, syntax=("cycle-length"),
                     help="Highlit bytes are now highlit cyclically")
+opt['period']    = ConfParam('period',
+                    help="Detects the periods of repeating records in each line "
+                    "and in the whole input (FFT autocorrelation) and prints "
+                    "them instead of the dump")
+opt['auto-cycle'] = ConfParam('auto-cycle',
+                    help="Detects the dominant record period of the input and "
+                    "uses it as @cycle-length (and highlights the first byte of "
+                    "each record if --highlight is not given)")
+opt['max-period'] = ConfParam('max-period', type=int, syntax=("max_period"),
+                    help="Longest period looked for by --period and "
+                    "--auto-cycle. Default is half the line length.")
+opt['transform'] = ConfParam('transform', shortname='t', type=str,
+                    syntax="name[:arg],...", default="",
+                    help="Transforms each line before any other processing, in "
+                    "the given order (e.g. delta,bit:0). Available: xor-ref, "
+                    "sub-ref (with the reference line), xor-key:HEX "
+                    "(repeating key), delta (with the previous byte), swap[:N] "
+                    "(reverses N-byte words), bit[:K] (keeps bit K of each "
+                    "byte)")
+opt['cluster']   = ConfParam('cluster',
+                    help="Groups lines into message types and renders them "
+                    "cluster by cluster, each line being diffed with its "
+                    "cluster's medoid")
+opt['cluster-dist'] = ConfParam('cluster-dist', type=float,
+                    syntax=("max_dist"), default=0.3,
+                    help="Maximum distance (between 0 and 1: differing bytes "
+                    "plus length difference, over the line length) between a "
+                    "line and its cluster's medoid. Default is 0.3.")
+opt['cluster-prefix'] = ConfParam('cluster-prefix', type=int,
+                    syntax=("prefix"), default=64,
+                    help="Number of bytes of each line compared for "
+                    "clustering. Default is 64.")
+opt['jobs']      = ConfParam('jobs', shortname='j', type=int, syntax=("jobs"),
+                    default=1,
+                    help="Number of processes used for clustering")
 opt['enc']       = ConfParam('enc', 'e', type=str, choices=available_encodings,
                     syntax="encoding", default='hex',
                     help="Encoding of bytes when displayed")
@@ -73,6 +110,11 @@ opt['start']     = ConfParam('start', 's', type=int, syntax=("start"),
                     "line")
 opt['width']     = ConfParam('width', shortname='w', type=int, syntax=("width"),
                     help="Maximum width (in bytes) to display")
+opt['columns']   = ConfParam('columns', type=str, syntax=("from:to"),
+                    help="Only displays the bytes from column @from to column "
+                    "@to (excluded) of each line, after --start. Either bound "
+                    "may be omitted. Only these bytes are processed, which "
+                    "keeps very long lines fast to display.")
 opt['align']     = ConfParam('align', type=int, syntax=('start', 'end'),
                     help="Aligns every line to end at @end (or further), by "
                     "shifting its content from @start to the right. Works with "
@@ -84,6 +126,34 @@ opt['filter']    = ConfParam('filter', shortname='f', type=str, nargs='+',
                     help="Filter lines that have byte @n set to @XX (in hex). "
                     "Use n=XX to keep lines that match and nxXX for lines that "
                     "do not match (e.g. 3=07 or 25x5a. Ideces start at 0.")
+opt['sample']    = ConfParam('sample', type=int, syntax=("count"),
+                    help="Only works on @count lines evenly spread over the "
+                    "input (by seeking in files, without reading them "
+                    "entirely) or drawn at random from stdin. Filters apply "
+                    "before sampling.")
+opt['per-header'] = ConfParam('per-header', type=int,
+                    syntax=("header_len", "count"),
+                    help="Only works on the @count first lines of each distinct "
+                    "header of @header_len bytes. Filters apply first.")
+opt['fields']    = ConfParam('fields',
+                    help="Looks for length fields (related to the line length) "
+                    "and checksums (sums, XOR, CRC-8/16/32) holding on every "
+                    "line and prints them instead of the dump")
+opt['auto-fields'] = ConfParam('auto-fields',
+                    help="Highlights the length fields and checksums found as "
+                    "with --fields")
+opt['rare']      = ConfParam('rare', type=float, syntax=("threshold"),
+                    help="Highlights bytes (or n-grams, see --rare-ngram) seen "
+                    "at their offset in less than @threshold of the lines "
+                    "(e.g. 0.01)")
+opt['rare-ngram'] = ConfParam('rare-ngram', type=int, syntax=("n"), default=2,
+                    help="Length of the byte sequences checked by --rare, from "
+                    "1 to 4. Default is 2.")
+opt['rare-warmup'] = ConfParam('rare-warmup', type=int, syntax=("lines"),
+                    default=1000,
+                    help="When reading --rare statistics from stdin, number of "
+                    "lines read before displaying anything. Files are read "
+                    "twice instead. Default is 1000.")
 # TODO
 #opt['sort']      = ConfParam('sort', type=int, syntax=("from_offset"),
 #                    default=0,
@@ -124,5 +194,48 @@ if args.disp_width is None:
     except:
         args.disp_width = 120
 
+def parse_columns(spec):
+    """Parses a "from:to" column window to a (from, to) pair of int, None
+    standing for an omitted bound."""
+    first, sep, last = spec.partition(":")
+    if not sep:
+        raise ValueError("columns must be given as from:to")
+    first = int(first) if first else None
+    last = int(last) if last else None
+    if (first is not None and first < 0) or (last is not None and last < 0):
+        raise ValueError("columns must be positive")
+    if first is not None and last is not None and first > last:
+        raise ValueError("columns must be given as from:to with from <= to")
+    return first, last
+
+if args.columns is not None:
+    try:
+        args.columns = parse_columns(args.columns)
+    except ValueError as e:
+        parser.error(str(e))
+
+if args.rare is not None and not 0 < args.rare <= 1:
+    parser.error("--rare threshold must be in (0, 1]")
+if not 1 <= args.rare_ngram <= 4:
+    parser.error("--rare-ngram must be from 1 to 4")
+
+def parse_transforms(specs):
+    """Parses a comma separated list of "name[:arg]" transform specs to a
+    TransformChain."""
+    chain = TransformChain()
+    chain.add_transforms([s for s in specs.split(",") if s])
+    return chain
+
+try:
+    args.transform = parse_transforms(args.transform)
+except ValueError as e:
+    parser.error(str(e))
+
 globals().update(vars(args))
 
+# (offset, size) of the fields to highlight, set by --auto-fields. Negative
+# offsets count from the end of the line.
+highlight_fields = []
+# RarityModel used to highlight rare bytes, set by --rare
+rarity = None
+
@@ -22,8 +22,9 @@ class Decoder(object):
 
     name = None
 
-    def decode(self, input_line):
-        """Decodes an @input_line (str) to a @return RawByteList."""
+    def decode(self, input_line, size=None):
+        """Decodes an @input_line (str) to a @return RawByteList. If @size is
+        given, only the @size first bytes need to be decoded."""
         raise NotImplementedError("Abstract method")
 
 
@@ -35,12 +36,14 @@ class CommentedHexDecoder(object):
 
     name = "hex"
 
-    def decode(self, input_line):
+    def decode(self, input_line, size=None):
         rbl = RawByteList()
         sp = input_line.strip().rsplit(" ", 1)
         if len(sp) > 1:
             rbl.comment = sp[0]
         str_hex = sp[-1]
+        if size is not None:
+            str_hex = str_hex[:2 * size]
         try:
             raw_bytes = binascii.unhexlify(str_hex)
             rbl.set_bytes(raw_bytes)
@@ -99,13 +102,17 @@ class RawByteFilter(object):
 
     def match(self, rb_list):
         """True if a RawByteList matches this filter."""
-        blist = rb_list.get_bytes()
+        return self.match_bytes([b.value for b in rb_list.get_bytes()])
+
+    def match_bytes(self, blist):
+        """True if a list of bytes (chars, or None/NoByte for no byte) matches
+        this filter."""
         l = len(blist)
         for index, values in self.filter.iteritems():
-            if index >= l or blist[index].value not in values:
+            if index >= l or blist[index] not in values:
                 return False
         for index, values in self.anti_filter.iteritems():
-            if index < l and blist[index].value in values:
+            if index < l and blist[index] in values:
                 return False
         return True
 
@@ -170,8 +177,17 @@ class RawByteList(object):
         # Processed bytes
         self._pbytes = None
         self.ref = None
+        # Raw bytes (str) of the line that reference transforms (xor-ref...)
+        # combine this line with, or None
+        self.transform_ref = None
         self.comment = ""
         self.is_processed = False
+        # Length of the processed line before the column window is applied,
+        # offset of the window in it, and (offset, size) of the NoBytes
+        # inserted by the alignment.
+        self._shaped_len = 0
+        self._columns_start = 0
+        self._align_gap = None
 
     def add_byte(self, b):
         """Adds a byte to this RawByteList.
@@ -191,7 +207,7 @@ class RawByteList(object):
             @byte_list: a list of bytes as characters (['\\x05', 'm', ...])
                 or a str ('\\x05m...')
         """
-        self._bytes = [b for b in byte_list]
+        self._bytes = list(byte_list)
 
     def set_ref(self, ref_raw_bytes):
         """Sets a reference byte list to be diffed with.
@@ -201,9 +217,22 @@ class RawByteList(object):
         """
         self.ref = ref_raw_bytes
 
+    def get_raw_bytes(self):
+        """Returns the unprocessed bytes of this line, as a str."""
+        return ''.join(self._bytes)
+
     def is_empty(self):
         return not bool(self.get_bytes())
 
+    def is_filtered_out(self):
+        """True if this line is empty once transformed, reshaped and filtered.
+        Unlike is_empty, the bytes are not highlit nor diffed, which is much
+        cheaper on long lines."""
+        if self.is_processed:
+            return self.is_empty()
+        self._select()
+        return not self._pbytes
+
     def get_bytes(self):
         """Returns a list of bytes processed. By default, all the processing
         parameters are taken from the conf.
@@ -217,23 +246,50 @@ class RawByteList(object):
         return self._pbytes
 
     def process(self):
-        """Processes the raw bytes to reshape, filter, highlight and diff
-        this line."""
+        """Processes the raw bytes to transform, reshape, filter, highlight
+        and diff this line.
+
+        Transforms run first, on the whole line: offsets of the other steps
+        refer to the transformed bytes, and filters match on them.
+
+        Reshaping and filtering work on a str (or a list once aligned). Only
+        the bytes in the column window (see _apply_columns) then become
+        RawBytes to be highlit and diffed, so that the cost of a line is
+        proportional to the displayed width rather than to its length.
+        """
         self.is_processed = True
-        self._pbytes = [RawByte(b) for b in self._bytes]
-        # shape tweaks (start + width + alignment)
-        self._reshape()
-        if not self._pbytes:
-            return
-        # filter (byte + size)
-        self._filter()
+        self._select()
         if not self._pbytes:
             return
+        # column window
+        self._apply_columns()
+        self._pbytes = [b if isinstance(b, NoByte) else RawByte(b)
+                        for b in self._pbytes]
         # highlight
         self._highlight()
+        self._highlight_fields()
+        self._highlight_rare()
         # diff
         self._diff()
 
+    def _select(self):
+        """Transforms, reshapes and filters the raw bytes to _pbytes, which is
+        left empty if this line is filtered out."""
+        self._pbytes = self._transform()
+        # shape tweaks (start + width + alignment)
+        self._reshape()
+        if not self._pbytes:
+            return
+        # filter (byte + size)
+        self._filter()
+
+    def _transform(self, chain=None):
+        """Returns the raw bytes (str) of this line transformed by @chain (a
+        TransformChain), or conf.transform if @chain is None, with
+        transform_ref as the reference line."""
+        chain = chain if chain is not None else conf.transform
+        return chain.apply(self.get_raw_bytes(), self.transform_ref)
+
     def _reshape(self):
         """Applies all the filters that affect the shape of a RawByteList,
         with values taken from the conf.
@@ -253,23 +309,80 @@ class RawByteList(object):
         self._apply_byte_filter()
 
     def _highlight(self, start=None, width=None, cycle=None):
-        """Sets the highlight flat on highlit bytes"""
+        """Sets the highlight flat on highlit bytes. Offsets are those of the
+        reshaped line: only the bytes in the column window are visited."""
         if (start is None or width is None) and conf.highlight is None:
             return
         start = start if start is not None else conf.highlight[0]
         width = width if width is not None else conf.highlight[1]
         cycle = cycle if cycle is not None else conf.cycle
-        l = len(self._pbytes)
+        l = self._shaped_len
         if l < start:
             return
-        end = min(l, start + width)
+        first = self._columns_start
+        last = first + len(self._pbytes)
         if cycle:
-            for i in range(start, l - width, cycle):
-                for k in range(i, i + width):
-                    self._pbytes[k].highlight = True
+            # skip the cycles ending before the window
+            skip = max(0, first - width + 1 - start)
+            i = start + (skip + cycle - 1) // cycle * cycle
+            while i < min(last, l - width):
+                for k in range(max(i, first), min(i + width, last)):
+                    self._pbytes[k - first].highlight = True
+                i += cycle
         else:
-            for i in range(start, start + width):
-                self._pbytes[i].highlight = True
+            for i in range(max(start, first), min(l, start + width, last)):
+                self._pbytes[i - first].highlight = True
+
+    def _highlight_fields(self, fields=None):
+        """Sets the highlight flag on the bytes of @fields, or
+        conf.highlight_fields if @fields is None: a list of (offset, size) in
+        the raw line, negative offsets counting from its end."""
+        fields = fields if fields is not None else conf.highlight_fields
+        l = len(self._bytes)
+        for offset, size in fields:
+            if offset < 0:
+                offset += l
+            # byte by byte, as the alignment may split the field
+            for i in range(offset, offset + size):
+                j = self._shaped_index(i)
+                if j is not None:
+                    self._highlight(j, 1, 0)
+
+    def _highlight_rare(self, model=None):
+        """Sets the highlight flag on the bytes that a RarityModel (@model, or
+        conf.rarity if @model is None) finds rare. Rarity is computed on the
+        raw bytes of the line."""
+        model = model if model is not None else conf.rarity
+        if model is None:
+            return
+        rare = model.rare(self.get_raw_bytes())
+        for k, raw_byte in enumerate(self._pbytes):
+            i = self._raw_index(self._columns_start + k)
+            if i is not None and i < len(rare) and rare[i]:
+                raw_byte.highlight = True
+
+    def _raw_index(self, i):
+        """Returns the offset in the raw line of the byte at offset @i of the
+        reshaped line, or None for bytes added by the alignment."""
+        if self._align_gap is not None:
+            pos, size = self._align_gap
+            if pos <= i < pos + size:
+                return None
+            if i >= pos + size:
+                i -= size
+        return i + conf.start
+
+    def _shaped_index(self, i):
+        """Returns the offset in the reshaped line of the byte at offset @i of
+        the raw line (the inverse of _raw_index), or None if it is cut."""
+        i -= conf.start
+        if i < 0:
+            return None
+        if self._align_gap is not None:
+            pos, size = self._align_gap
+            if i >= pos:
+                i += size
+        return i
 
     def _diff(self):
         if self.ref:
@@ -296,7 +409,24 @@ class RawByteList(object):
         l = len(self._pbytes)
         if end > l:
             dif = end - l
+            self._pbytes = list(self._pbytes)
             self._pbytes[start:start] = [NoByte()] * dif
+            pos = start if start >= 0 else max(0, l + start)
+            self._align_gap = (min(pos, l), dif)
+
+    def _apply_columns(self, columns=None):
+        """Keeps only the bytes in the column window @columns, or conf.columns
+        if @columns is None: a (from, to) pair of offsets in the reshaped line,
+        either of them being None for no limit."""
+        columns = columns if columns is not None else conf.columns
+        self._shaped_len = len(self._pbytes)
+        self._columns_start = 0
+        if columns is None:
+            return
+        first, last = columns
+        first = min(first or 0, len(self._pbytes))
+        self._pbytes = self._pbytes[first:last]
+        self._columns_start = first
 
     def _apply_min(self, min=None):
         if min is None:
@@ -311,7 +441,7 @@ class RawByteList(object):
         rules = rules if rules is not None else conf.filter
         f = RawByteFilter()
         f.add_filters(rules)
-        if not f.match(self):
+        if not f.match_bytes(self._pbytes):
             self._pbytes = []
 
 
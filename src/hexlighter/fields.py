@@ -0,0 +1,365 @@
+import binascii
+import struct
+
+import numpy as np
+
+
+def _resolve(offset, length):
+    """Converts an offset that may be negative (counted from the end, like
+    python slices) or None (the end) to an offset from the start."""
+    if offset is None:
+        return length
+    return offset if offset >= 0 else length + offset
+
+
+def read_field(data, offset, width, endian):
+    """Returns the unsigned integer of @width bytes at @offset in @data, @endian
+    being '>' (big endian) or '<' (little endian), or None if it does not fit
+    in @data."""
+    start = _resolve(offset, len(data))
+    if start < 0 or start + width > len(data):
+        return None
+    fmt = endian + {1: 'B', 2: 'H', 4: 'I'}[width]
+    return struct.unpack(fmt, data[start:start + width])[0]
+
+
+def _width_name(width, endian):
+    if width == 1:
+        return "u8"
+    return "u%d %s" % (8 * width, "be" if endian == '>' else "le")
+
+
+class Checksum(object):
+    """Base class. Child classes compute one checksum algorithm."""
+
+    name = None
+    width = None
+
+    def compute(self, data):
+        """Returns the checksum (int) of @data (a str)."""
+        raise NotImplementedError("Abstract method")
+
+
+class Sum(Checksum):
+    """Sum of the bytes, modulo 2^(8 * width), optionally negated (two's
+    complement checksum)."""
+
+    def __init__(self, name, width, negate=False):
+        self.name = name
+        self.width = width
+        self.negate = negate
+        self.mask = (1 << (8 * width)) - 1
+
+    def _finish(self, s):
+        return (-s if self.negate else s) & self.mask
+
+    def compute(self, data):
+        return self._finish(sum(bytearray(data)))
+
+
+class Xor(Checksum):
+    name = "xor8"
+    width = 1
+
+    def compute(self, data):
+        return int(np.bitwise_xor.reduce(np.frombuffer(data, np.uint8))) \
+            if data else 0
+
+
+class Crc(Checksum):
+    """Table-driven CRC: reflected CRC-16, or non-reflected CRC-8 (the
+    non-reflected CRC-16 variants are computed by CrcHqx)."""
+
+    def __init__(self, name, width, poly, init, reflected):
+        self.name = name
+        self.width = width
+        self.init = init
+        self.reflected = reflected
+        self.table = self._table(poly)
+
+    def _table(self, poly):
+        table = []
+        for i in range(256):
+            c = i
+            for _ in range(8):
+                if self.reflected:
+                    c = (c >> 1) ^ poly if c & 1 else c >> 1
+                else:
+                    c = ((c << 1) ^ poly) & 0xff if c & 0x80 else c << 1
+            table.append(c)
+        return table
+
+    def compute(self, data):
+        crc = self.init
+        table = self.table
+        if self.reflected:
+            for b in bytearray(data):
+                crc = (crc >> 8) ^ table[(crc ^ b) & 0xff]
+        else:
+            for b in bytearray(data):
+                crc = table[crc ^ b]
+        return crc
+
+
+class CrcHqx(Checksum):
+    """CRC-16 with polynomial 0x1021 (CCITT), computed by binascii."""
+
+    width = 2
+
+    def __init__(self, name, init):
+        self.name = name
+        self.init = init
+
+    def compute(self, data):
+        return binascii.crc_hqx(data, self.init)
+
+
+class Crc32(Checksum):
+    """Standard CRC-32 (zlib, ethernet...), computed by binascii."""
+
+    name = "crc32"
+    width = 4
+
+    def compute(self, data):
+        return binascii.crc32(data) & 0xffffffff
+
+
+checksums = [
+    Sum("sum8", 1),
+    Sum("sum8-neg", 1, negate=True),
+    Sum("sum16", 2),
+    Xor(),
+    Crc("crc8", 1, 0x07, 0, False),
+    Crc("crc16-arc", 2, 0xa001, 0, True),
+    Crc("crc16-modbus", 2, 0xa001, 0xffff, True),
+    CrcHqx("crc16-ccitt", 0xffff),
+    CrcHqx("crc16-xmodem", 0),
+    Crc32(),
+]
+
+
+class ChecksumField(object):
+    """An hypothesis: the @width bytes at @offset hold the checksum of the
+    bytes in [@start:@end]. Offsets are like python slice bounds: negative
+    ones count from the end of the line, and @end may be None."""
+
+    def __init__(self, checksum, endian, offset, start, end):
+        self.checksum = checksum
+        self.endian = endian
+        self.offset = offset
+        self.start = start
+        self.end = end
+        self.width = checksum.width
+        self.lines = 0
+        # distinct values seen (up to 2): a constant field proves nothing
+        self.values = set()
+
+    def bounds(self, length):
+        """Returns the (start, end) of the checked range for a line of
+        @length bytes, or None if the line is too short."""
+        field = _resolve(self.offset, length)
+        s, e = _resolve(self.start, length), _resolve(self.end, length)
+        if field < 0 or field + self.width > length or not 0 <= s < e:
+            return None
+        if s < field + self.width and field < e:
+            return None
+        return s, e
+
+    def __str__(self):
+        end = "" if self.end is None else str(self.end)
+        return ("checksum at offset %d: %s %s over [%d:%s]"
+                % (self.offset, self.checksum.name,
+                   _width_name(self.width, self.endian), self.start, end))
+
+
+class LengthField(object):
+    """An hypothesis: the @width bytes at @offset hold the line length plus
+    @delta."""
+
+    def __init__(self, offset, width, endian, delta, lines):
+        self.offset = offset
+        self.width = width
+        self.endian = endian
+        self.delta = delta
+        self.lines = lines
+
+    def __str__(self):
+        if self.delta == -(self.offset + self.width):
+            what = "number of bytes after it"
+        elif self.delta:
+            what = "line length %+d" % self.delta
+        else:
+            what = "line length"
+        return ("length at offset %d: %s = %s"
+                % (self.offset, _width_name(self.width, self.endian), what))
+
+
+class FieldDetector(object):
+    """Finds length and checksum fields holding on every line.
+
+    Checksum hypotheses are enumerated on the first line: a field at one of
+    the @max_offset first offsets (checking the bytes after it), or at the end
+    of the line (checking the bytes before it, up to @max_trailer bytes of
+    trailer after it). Each following line drops the hypotheses it refutes,
+    so that after a few lines only the true fields are still checked.
+
+    Length hypotheses are checked on the @prefix first bytes of the lines,
+    all offsets, widths and endiannesses at once, chunk by chunk.
+    """
+
+    def __init__(self, prefix=64, max_offset=16, max_trailer=2, chunk=256):
+        self.prefix = prefix
+        self.max_offset = max_offset
+        self.max_trailer = max_trailer
+        self.chunk_size = chunk
+        self.fields = None
+        self.lines = 0
+        self.chunk = []
+        # (width, endian) -> LengthState
+        self.lengths = {}
+
+    def add(self, data):
+        """Checks the hypotheses on one line of bytes (str)."""
+        if not data:
+            return
+        self.lines += 1
+        if self.fields is None:
+            self.fields = self._checksum_hypotheses()
+        # both endiannesses of a field share the same checksums
+        cache = {}
+        self.fields = [f for f in self.fields if self._check(f, data, cache)]
+        self.chunk.append((data[:self.prefix + 3], len(data)))
+        if len(self.chunk) >= self.chunk_size:
+            self._check_lengths()
+
+    def checksum_fields(self):
+        """Returns the confirmed ChecksumFields, keeping the widest range for
+        each field."""
+        self._check_lengths()
+        best = {}
+        for f in self.fields or []:
+            if len(f.values) < 2 or 2 * f.lines < self.lines:
+                continue
+            key = (f.checksum.name, f.endian, f.offset, f.end)
+            if key not in best or f.start < best[key].start:
+                best[key] = f
+        return sorted(best.values(), key=lambda f: (f.offset < 0, f.offset))
+
+    def length_fields(self):
+        """Returns the confirmed LengthFields, dropping the narrow ones lying
+        in a wider one."""
+        self._check_lengths()
+        found = []
+        for (width, endian), state in self.lengths.items():
+            for o in state.found(self.lines):
+                found.append(LengthField(int(o), width, endian,
+                                         int(state.delta[o]),
+                                         int(state.count[o])))
+        found.sort(key=lambda f: -f.width)
+        kept = []
+        for f in found:
+            if not any(k.offset <= f.offset and
+                       f.offset + f.width <= k.offset + k.width for k in kept):
+                kept.append(f)
+        return sorted(kept, key=lambda f: f.offset)
+
+    def _checksum_hypotheses(self):
+        fields = []
+        for c in checksums:
+            w = c.width
+            for endian in ('>', '<') if w > 1 else ('>',):
+                for t in range(self.max_trailer + 1):
+                    for s in range(self.max_offset):
+                        fields.append(ChecksumField(c, endian, -(w + t), s,
+                                                    -(w + t)))
+                for o in range(self.max_offset):
+                    for g in range(4):
+                        fields.append(ChecksumField(c, endian, o, o + w + g,
+                                                    None))
+        return fields
+
+    def _check(self, field, data, cache):
+        bounds = field.bounds(len(data))
+        if bounds is None:
+            return True
+        key = (field.checksum.name, bounds)
+        if key not in cache:
+            cache[key] = field.checksum.compute(data[bounds[0]:bounds[1]])
+        value = read_field(data, field.offset, field.width, field.endian)
+        if cache[key] != value:
+            return False
+        field.lines += 1
+        if len(field.values) < 2:
+            field.values.add(value)
+        return True
+
+    def _check_lengths(self):
+        """Checks the length hypotheses on the buffered lines: a field at
+        offset o holds if its value minus the line length is the same on every
+        line long enough to hold it."""
+        if not self.chunk:
+            return
+        n = len(self.chunk)
+        size = self.prefix + 3
+        matrix = np.zeros((n, size), dtype=np.int64)
+        lengths = np.zeros(n, dtype=np.int64)
+        for i, (line, length) in enumerate(self.chunk):
+            lengths[i] = length
+            matrix[i, :len(line)] = np.frombuffer(line, np.uint8)
+        self.chunk = []
+        for width in (1, 2, 4):
+            for endian in ('>', '<') if width > 1 else ('>',):
+                state = self.lengths.setdefault((width, endian),
+                                                LengthState(self.prefix))
+                if not state.alive.any():
+                    continue
+                cols = [matrix[:, k:self.prefix + k] for k in range(width)]
+                if endian == '<':
+                    cols.reverse()
+                value = np.zeros((n, self.prefix), dtype=np.int64)
+                for col in cols:
+                    value = value * 256 + col
+                state.update(value, lengths, width)
+
+
+class LengthState(object):
+    """State of the length hypotheses of one width and endianness, for every
+    offset of the prefix.
+
+    Attributes:
+        @delta: field value minus line length on the first line holding it
+        @alive: False once a line refuted the hypothesis
+        @count: number of lines long enough to hold the field
+        @first_len: length of the first line holding the field
+        @varied: True once lines of different lengths held the field
+    """
+
+    def __init__(self, prefix):
+        self.delta = np.zeros(prefix, dtype=np.int64)
+        self.alive = np.ones(prefix, dtype=bool)
+        self.count = np.zeros(prefix, dtype=np.int64)
+        self.first_len = np.full(prefix, -1, dtype=np.int64)
+        self.varied = np.zeros(prefix, dtype=bool)
+
+    def update(self, value, lengths, width):
+        """Checks a chunk of lines, @value being the (lines, prefix) matrix of
+        the field values at each offset and @lengths the line lengths."""
+        offsets = np.arange(value.shape[1])
+        valid = offsets[None, :] + width <= lengths[:, None]
+        delta = value - lengths[:, None]
+        new = (self.first_len < 0) & valid.any(axis=0)
+        first = np.argmax(valid, axis=0)[new]
+        self.delta[new] = delta[first, offsets[new]]
+        self.first_len[new] = lengths[first]
+        self.alive &= ~(valid & (delta != self.delta)).any(axis=0)
+        self.count += valid.sum(axis=0)
+        self.varied |= (valid & (lengths[:, None] != self.first_len)).any(axis=0)
+
+    def found(self, lines, max_delta=255):
+        """Returns the offsets holding a length field on at least half of
+        @lines lines, of different lengths. Fields further than @max_delta
+        from the line length are dropped: they are mostly constant bytes next
+        to the real field."""
+        return np.flatnonzero(self.alive & self.varied &
+                              (2 * self.count >= lines) &
+                              (np.abs(self.delta) <= max_delta))
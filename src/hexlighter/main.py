@@ -1,25 +1,309 @@
+from array import array
 import sys
+import tempfile
+
+import numpy as np
 
 from hexlighter.core import *
 from hexlighter import conf
 from hexlighter.termrenderer import TermRenderer
 from hexlighter.drawrenderer import DrawRenderer
+from hexlighter.period import PeriodDetector
+from hexlighter.cluster import Clusterer, assign_all
+from hexlighter.fields import FieldDetector
+from hexlighter.rarity import RarityModel
+from hexlighter.sampling import (sample_lines, reservoir_sample,
+                                 stride_sample, per_header)
 
 renderer2class = {
     'term': TermRenderer,
     'draw': DrawRenderer,
 }
 
+def detect_periods(lines, verbose=False):
+    """Runs a PeriodDetector on every line of @lines and @return the
+    aggregated PeriodReport. Prints the report of each line if @verbose."""
+    decoder = CommentedHexDecoder()
+    detector = PeriodDetector(conf.max_period)
+    shift = 0
+    for line in lines:
+        rbl = decoder.decode(line)
+        report = detector.add(rbl.get_raw_bytes(), rbl.comment)
+        if verbose:
+            shift = max(len(report.comment) + 1, shift)
+            print(("%%-%ds%%s" % shift) % (report.comment, report))
+    aggregated = detector.aggregate()
+    if verbose:
+        shift = max(len(aggregated.comment) + 2, shift)
+        print(("%%-%ds%%s" % shift) % (aggregated.comment + ":", aggregated))
+    return aggregated
+
+def apply_auto_cycle(lines):
+    """Detects the dominant period of @lines and uses it as conf.cycle."""
+    best = detect_periods(lines).best()
+    if best is None:
+        return
+    period, _, offset, _ = best
+    start = offset - conf.start
+    if start < 0:
+        start %= period
+    conf.cycle = period
+    if conf.highlight is None:
+        conf.highlight = [start, 1]
+
+def is_seekable(f):
+    return isinstance(f, file) and f is not sys.stdin
+
+def detect_fields(lines, verbose=False):
+    """Runs a FieldDetector on every line of @lines and @return the confirmed
+    (length fields, checksum fields). Prints them if @verbose."""
+    decoder = CommentedHexDecoder()
+    detector = FieldDetector()
+    for line in lines:
+        detector.add(decoder.decode(line).get_raw_bytes())
+    lengths = detector.length_fields()
+    checksums = detector.checksum_fields()
+    if verbose:
+        for field in lengths + checksums:
+            print("%s (%d lines)" % (field, field.lines))
+        if not lengths and not checksums:
+            print("no length field nor checksum found")
+    return lengths, checksums
+
+def apply_auto_fields(lines):
+    """Highlights the length and checksum fields found in @lines."""
+    lengths, checksums = detect_fields(lines)
+    conf.highlight_fields = [(f.offset, f.width) for f in lengths + checksums]
+
+def learn_rarity(lines, model):
+    """Counts the bytes of every line of @lines in @model."""
+    decoder = CommentedHexDecoder()
+    for line in lines:
+        model.update(decoder.decode(line).get_raw_bytes())
+
+def rarity_stream(lines, model, warmup):
+    """Yields the lines of @lines once counted in @model, the first @warmup
+    ones being held until they are all counted, so that rarity is not judged
+    on too few lines."""
+    decoder = CommentedHexDecoder()
+    held = []
+    for line in lines:
+        model.update(decoder.decode(line).get_raw_bytes())
+        if held is None:
+            yield line
+            continue
+        held.append(line)
+        if len(held) >= warmup:
+            for l in held:
+                yield l
+            held = None
+    for l in held or []:
+        yield l
+
+def rewind(f):
+    """Returns @f ready to be read again from its first line: @f itself if it
+    is a file, else a list of its lines."""
+    if is_seekable(f):
+        f.seek(0)
+        return f
+    return f if isinstance(f, list) else list(f)
+
+def seekable(f):
+    """Returns @f if it is a regular file, else a temporary file holding its
+    lines (@f being any iterable of lines), so that lines can be read again
+    from their offset."""
+    if is_seekable(f):
+        return f
+    tmp = tempfile.TemporaryFile()
+    for line in f:
+        tmp.write(line)
+    tmp.seek(0)
+    return tmp
+
+def line_offsets(f):
+    """Yields (offset, line) for every line of @f, from its current
+    position."""
+    offset = f.tell()
+    for line in f:
+        yield offset, line
+        offset += len(line)
+
+def raw_bytes(line):
+    """Returns the bytes (str) of an input line."""
+    return CommentedHexDecoder().decode(line).get_raw_bytes()
+
+def read_line(f, offset):
+    f.seek(offset)
+    return f.readline()
+
+def chunks(iterable, size):
+    """Yields lists of @size items of @iterable."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+cluster_sample_size = 4096
+cluster_chunk_size = 10000
+max_clusters = 1024
+
+def cluster_lines(f):
+    """Groups the lines of @f into message types (see Clusterer).
+
+    Only the offset and cluster of each line are kept in memory: lines are
+    read again from @f to render them.
+
+    Return:
+        (clusterer, offsets, cluster): offsets and cluster being arrays of the
+        offset and cluster number (-1 if none) of each line.
+    """
+    clusterer = Clusterer(conf.cluster_dist, conf.cluster_prefix,
+                          max_clusters)
+    f.seek(0)
+    offsets = array('l', (offset for offset, _ in line_offsets(f)))
+    # only the sampled lines are decoded here: the assignment decodes the
+    # others in the worker processes
+    indexes, sample = sample_lines(offsets, cluster_sample_size)
+    sample = [(i, raw_bytes(read_line(f, o))) for i, o in zip(indexes, sample)]
+    # empty lines (blank or comment only) are left unclustered
+    sample = [(i, raw) for i, raw in sample if raw]
+    clusterer.fit([i for i, _ in sample], [raw for _, raw in sample])
+    f.seek(0)
+    cluster = assign_all(clusterer, chunks(f, cluster_chunk_size), conf.jobs,
+                         raw_bytes)
+    for i in np.flatnonzero(cluster < 0):
+        raw = raw_bytes(read_line(f, offsets[i]))
+        if raw:
+            cluster[i] = clusterer.add_outlier(i, raw)
+    return clusterer, offsets, cluster
+
+def render_clusters(f, renderer):
+    """Renders the lines of @f cluster by cluster, biggest first, each line
+    being diffed (and transformed) with the medoid of its cluster. Unclustered
+    lines come last, diffed with the previous one."""
+    clusterer, offsets, cluster = cluster_lines(f)
+    decoder = CommentedHexDecoder()
+    sizes = np.bincount(cluster + 1, minlength=len(clusterer.medoids) + 1)
+    order = sorted(range(len(clusterer.medoids)), key=lambda c: -sizes[c + 1])
+    members = np.argsort(cluster, kind='mergesort')
+    bounds = np.concatenate(([0], np.cumsum(sizes)))
+    summary = []
+    for c in order + [-1]:
+        lines = members[bounds[c + 1]:bounds[c + 2]]
+        if not len(lines):
+            continue
+        if c < 0:
+            print("unclustered: %d lines" % len(lines))
+            ref = raw_ref = None
+        else:
+            medoid = clusterer.medoids[c]
+            ref = decoder.decode(read_line(f, offsets[medoid]))
+            raw_ref = ref.get_raw_bytes()
+            summary.append("cluster %d: %d lines, medoid %s(%d bytes)"
+                           % (len(summary), len(lines),
+                              ref.comment + " " if ref.comment else "",
+                              len(ref.get_raw_bytes())))
+            print("cluster %d: %d lines" % (len(summary) - 1, len(lines)))
+            renderer.render(EncodedByteList(ref))
+        for i in lines:
+            if c >= 0 and i == medoid:
+                continue
+            rbl = decoder.decode(read_line(f, offsets[i]))
+            rbl.ref = ref
+            rbl.transform_ref = raw_ref
+            if c < 0:
+                raw_ref = rbl.get_raw_bytes() or raw_ref
+                if not rbl.is_empty():
+                    ref = rbl
+            renderer.render(EncodedByteList(rbl))
+    renderer.finalize()
+    print("%d lines in %d clusters, %d unclustered"
+          % (len(cluster), len(summary), sizes[0]))
+    for line in summary:
+        print(line)
+
+def display_filter():
+    """Returns a function telling if a line (str) is kept by the filters of
+    the conf (start, min, filter) once transformed, or None if there is no
+    filter. Reference transforms combine each line with the previous line
+    given to the function (the first one with --master)."""
+    if not conf.filter and not conf.min and not conf.start:
+        return None
+    decoder = CommentedHexDecoder()
+    prev = [None]
+    def is_displayed(line):
+        rbl = decoder.decode(line)
+        rbl.transform_ref = prev[0]
+        if (prev[0] is None or not conf.master) and rbl.get_raw_bytes():
+            prev[0] = rbl.get_raw_bytes()
+        return not rbl.is_filtered_out()
+    return is_displayed
+
+def preview(f):
+    """Returns the lines of @f to work on: all of them, or only a preview of
+    them when asked for in the conf (see per-header and sample). Previews only
+    keep lines that are displayed with the current filters."""
+    if not conf.per_header and not conf.sample:
+        return f
+    lines = f
+    keep = display_filter()
+    if conf.per_header:
+        decoder = CommentedHexDecoder()
+        length, count = conf.per_header
+        header = lambda line: decoder.decode(line, length).get_raw_bytes()
+        lines = per_header(lines, header, count, keep)
+    if conf.sample:
+        if lines is f and is_seekable(f):
+            lines = stride_sample(f, conf.sample, keep)
+        else:
+            keep = keep if lines is f else None
+            lines = reservoir_sample(lines, conf.sample, keep)
+    return lines
+
 def main():
     if conf.file:
         f = open(conf.file, "r")
     else:
         f = sys.stdin
+    f = preview(f)
+    if conf.period:
+        detect_periods(f, verbose=True)
+        return
+    if conf.fields:
+        detect_fields(f, verbose=True)
+        return
+    if conf.auto_cycle:
+        f = rewind(f)
+        apply_auto_cycle(f)
+    if conf.auto_fields:
+        f = rewind(f)
+        apply_auto_fields(f)
+    f = rewind(f) if conf.auto_cycle or conf.auto_fields else f
+    if conf.rare is not None:
+        conf.rarity = RarityModel(conf.rare, conf.rare_ngram)
+        if is_seekable(f) or isinstance(f, list):
+            learn_rarity(f, conf.rarity)
+            f = rewind(f)
+        else:
+            f = rarity_stream(f, conf.rarity, conf.rare_warmup)
     renderer = renderer2class[conf.render]()
+    if conf.cluster:
+        render_clusters(seekable(f), renderer)
+        return
     decoder = CommentedHexDecoder()
     prev = None
+    # reference transforms combine lines with the previous one even if it is
+    # not displayed, since filters match on transformed bytes
+    prev_raw = None
     for line in f:
         rbl = decoder.decode(line)
+        rbl.transform_ref = prev_raw
+        if (prev_raw is None or not conf.master) and rbl.get_raw_bytes():
+            prev_raw = rbl.get_raw_bytes()
         if prev is not None:
             rbl.ref = prev
         if (prev is None or not conf.master) and not rbl.is_empty():
@@ -30,4 +314,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
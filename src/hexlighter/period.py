@@ -0,0 +1,246 @@
+from collections import Counter
+
+import numpy as np
+
+# Every byte value is mapped to a fixed pseudo-random phase on the unit circle.
+# The correlation of two equal bytes is then exactly 1, while two different
+# bytes contribute cos(phase_a - phase_b), which averages to 0. Scrambling the
+# phases (instead of using 2*pi*b/256) prevents close values (counters, ascii)
+# from looking periodic at every lag.
+byte_phase = np.exp(2j * np.pi * np.random.RandomState(0x4e1).rand(256))
+
+
+def _fft_size(n):
+    """Returns the smallest power of two >= 2 * @n, so that the circular
+    correlation computed by the FFT does not wrap around."""
+    size = 1
+    while size < 2 * n:
+        size <<= 1
+    return size
+
+
+def _as_array(data):
+    """Converts @data (str or uint8 array) to a uint8 numpy array."""
+    if isinstance(data, np.ndarray):
+        return data
+    return np.frombuffer(data, dtype=np.uint8)
+
+
+def autocorrelation(data, max_lag=None):
+    """Computes the autocorrelation of a byte string for every lag in
+    [0, @max_lag], in O(n log n).
+
+    Args:
+        @data: a str (or uint8 numpy array) of bytes
+        @max_lag: last lag to compute, defaults to len(@data) - 1
+
+    Return:
+        (corr, overlap): two numpy arrays of size @max_lag + 1. corr[k] is the
+        sum over i of the similarity of bytes i and i + k (1 when equal, 0 on
+        average otherwise), overlap[k] is the number of compared pairs.
+    """
+    a = _as_array(data)
+    n = len(a)
+    if max_lag is None or max_lag >= n:
+        max_lag = n - 1
+    if max_lag < 0:
+        return np.zeros(0), np.zeros(0)
+    z = byte_phase[a]
+    f = np.fft.fft(z, _fft_size(n))
+    corr = np.fft.ifft(f * f.conj())[:max_lag + 1].real
+    overlap = np.arange(n, n - max_lag - 1, -1, dtype=np.float64)
+    return corr, overlap
+
+
+def record_offset(data, period):
+    """Returns (offset, count): the offset at which @period-long records start
+    in @data and the number of records from there.
+
+    The bytes of a record that are stable from one record to the next are
+    found by majority over the whole line; records start at the first window
+    of @period bytes in which exactly those bytes repeat.
+    """
+    a = _as_array(data)
+    n = len(a)
+    if period <= 0 or 2 * period > n:
+        return 0, 0
+    match = a[period:] == a[:-period]
+    rows = len(match) // period
+    stable = match[:rows * period].reshape(rows, period).mean(axis=0) >= 0.5
+    wrong = np.concatenate(([0], np.cumsum(match != np.resize(stable,
+                                                              len(match)))))
+    window = wrong[period:] - wrong[:-period]
+    offset = int(np.argmin(window))
+    return offset, (n - offset) // period
+
+
+def exact_correlation(data, lags):
+    """Returns the exact number of equal bytes between @data and @data shifted
+    by each lag of @lags (a numpy array)."""
+    a = _as_array(data)
+    return np.array([np.count_nonzero(a[k:] == a[:len(a) - k]) for k in lags],
+                    dtype=np.float64)
+
+
+def dominant_periods(score, count=3, min_score=0.5):
+    """Selects the dominant periods from a normalized autocorrelation.
+
+    Multiples of a period are as correlated as the period itself, so lags are
+    considered from the smallest to the biggest and a lag is dropped if it is a
+    multiple of an already selected period that scores nearly as well.
+
+    Args:
+        @score: numpy array, @score[k] being the normalized autocorrelation at
+            lag k (@score[0] is ignored)
+        @count: maximum number of periods to return
+        @min_score: score (or numpy array of per-lag scores) under which a
+            lag is not considered periodic
+
+    Return:
+        a list of (period, score), by decreasing score
+    """
+    selected = []
+    for k in np.flatnonzero(score >= min_score):
+        if k == 0 or any(k % p == 0 and s >= 0.9 * score[k]
+                         for p, s in selected):
+            continue
+        selected.append((int(k), float(score[k])))
+    selected.sort(key=lambda ps: (-ps[1], ps[0]))
+    return selected[:count]
+
+
+class PeriodReport(object):
+    """Periods detected on one line (or on the aggregation of several lines).
+
+    Attributes:
+        @periods: a list of (period, score, offset, count), by decreasing score
+        @comment: comment of the analysed line
+        @unit: what the count of each period represents
+    """
+
+    def __init__(self, periods, comment="", unit="records"):
+        self.periods = periods
+        self.comment = comment
+        self.unit = unit
+
+    def best(self):
+        """Returns the dominant (period, score, offset, count), or None."""
+        return self.periods[0] if self.periods else None
+
+    def __str__(self):
+        if not self.periods:
+            return "no period"
+        return ", ".join("period %d at offset %d (score %.2f, %d %s)"
+                         % (p, o, s, c, self.unit)
+                         for p, s, o, c in self.periods)
+
+
+class PeriodDetector(object):
+    """Detects record periods line by line, and on all the lines at once.
+
+    The FFT autocorrelation is only an estimate: a few distinct byte pairs
+    repeated all along a line can add up to a high score. It is used to pick
+    the @verify most promising lags of each line, which are then recounted
+    exactly. Only recounted lags are reported.
+
+    The aggregated score of a lag is the sum of its exact counts over the sum
+    of the overlaps of the lines where it was recounted, so only two arrays of
+    size @max_period are kept whatever the number of lines.
+    """
+
+    def __init__(self, max_period=None, count=3, min_score=0.5, verify=32):
+        self.max_period = max_period
+        self.count = count
+        self.min_score = min_score
+        self.verify = verify
+        self.corr = np.zeros(0)
+        self.overlap = np.zeros(0)
+        # (period, offset) -> number of lines where it was dominant
+        self.offsets = Counter()
+
+    def add(self, data, comment=""):
+        """Analyses one line of bytes (str) and @return its PeriodReport."""
+        a = _as_array(data)
+        max_lag = len(a) // 2
+        if self.max_period is not None:
+            max_lag = min(max_lag, self.max_period)
+        corr, overlap = autocorrelation(a, max_lag)
+        lags = self._best_lags(corr / np.maximum(overlap, 1))
+        exact = np.zeros(len(corr))
+        exact[lags] = exact_correlation(a, lags)
+        # lags that were not recounted say nothing about this line
+        counted = np.zeros(len(corr))
+        counted[lags] = overlap[lags]
+        self._accumulate(exact, counted)
+        report = self._report(a, exact, overlap, comment)
+        best = report.best()
+        if best is not None:
+            self.offsets[best[0], best[2]] += 1
+        return report
+
+    def aggregate(self):
+        """Returns the PeriodReport of all the lines added so far."""
+        periods = []
+        for p, s in self._periods(self.corr, self.overlap):
+            offsets = [(n, o) for (q, o), n in self.offsets.items() if q == p]
+            offset = max(offsets)[1] if offsets else 0
+            lines = sum(n for n, o in offsets)
+            periods.append((p, s, offset, lines))
+        return PeriodReport(periods, "all lines", unit="lines")
+
+    def _best_lags(self, score):
+        """Returns up to @self.verify lags of highest @score (lag 0 excluded).
+
+        Every multiple of a period scores about as well as the period itself,
+        so which of them rank first is down to noise: each lag is replaced by
+        its fundamental (see _fundamental), and multiples of an already chosen
+        lag are skipped so that other candidates get verified too."""
+        if len(score) < 2:
+            return np.zeros(0, dtype=np.intp)
+        pool = 8 * self.verify
+        lags = np.arange(1, len(score))
+        if len(lags) > pool:
+            lags = lags[np.argpartition(-score[1:], pool)[:pool]]
+        lags = lags[np.lexsort((lags, -score[lags]))]
+        chosen = []
+        for k in lags:
+            k = self._fundamental(score, k)
+            if not any(k % c == 0 for c in chosen):
+                chosen.append(k)
+                if len(chosen) == self.verify:
+                    break
+        return np.array(chosen, dtype=np.intp)
+
+    def _fundamental(self, score, k, tolerance=0.9):
+        """Returns the smallest divisor of lag @k whose @score is nearly as
+        good as the score of @k."""
+        d = np.arange(1, int(np.sqrt(k)) + 1)
+        small = d[k % d == 0]
+        divisors = np.concatenate((small, k // small[::-1]))
+        good = divisors[score[divisors] >= tolerance * score[k]]
+        return int(good[0]) if len(good) else k
+
+    def _accumulate(self, corr, overlap):
+        l = len(corr)
+        grow = l - len(self.corr)
+        if grow > 0:
+            self.corr = np.concatenate((self.corr, np.zeros(grow)))
+            self.overlap = np.concatenate((self.overlap, np.zeros(grow)))
+        self.corr[:l] += corr
+        self.overlap[:l] += overlap
+
+    def _periods(self, corr, overlap):
+        if len(corr) < 2:
+            return []
+        overlap = np.maximum(overlap, 1)
+        # On short overlaps, a high match rate can be a coincidence: demand a
+        # few standard deviations above a random match.
+        min_score = np.maximum(self.min_score, 4 / np.sqrt(overlap))
+        return dominant_periods(corr / overlap, self.count, min_score)
+
+    def _report(self, a, corr, overlap, comment):
+        periods = []
+        for p, s in self._periods(corr, overlap):
+            offset, count = record_offset(a, p)
+            periods.append((p, s, offset, count))
+        return PeriodReport(periods, comment)
@@ -0,0 +1,93 @@
+import numpy as np
+
+mersenne_prime = (1 << 31) - 1
+
+
+class CountMinSketch(object):
+    """Approximate counts of integer keys in a fixed amount of memory
+    (@depth * @width counters). Counts are never underestimated."""
+
+    def __init__(self, depth=4, width=1 << 16, seed=0):
+        rng = np.random.RandomState(seed)
+        self.width = width
+        self.a = rng.randint(1, mersenne_prime, depth).astype(np.int64)
+        self.b = rng.randint(0, mersenne_prime, depth).astype(np.int64)
+        self.table = np.zeros((depth, width), dtype=np.int64)
+
+    def _buckets(self, keys):
+        keys = keys % mersenne_prime
+        return (self.a[:, None] * keys + self.b[:, None]) \
+            % mersenne_prime % self.width
+
+    def add(self, keys):
+        """Counts one occurrence of each key of @keys (a numpy int64 array)."""
+        for row, buckets in zip(self.table, self._buckets(keys)):
+            np.add.at(row, buckets, 1)
+
+    def query(self, keys):
+        """Returns the estimated counts of @keys (a numpy int64 array)."""
+        buckets = self._buckets(keys)
+        return self.table[np.arange(len(self.table))[:, None], buckets] \
+            .min(axis=0)
+
+
+class RarityModel(object):
+    """Streaming statistics telling which bytes of a line are unusual at their
+    offset.
+
+    A byte is rare if its value was seen at its offset in less than
+    @threshold of the lines long enough to hold it, or if it is part of an
+    @ngram bytes long sequence of usual bytes that was seen that rarely at its
+    offset.
+    Byte values are counted exactly per offset, n-grams in a CountMinSketch,
+    so memory does not depend on the input size. Only the @max_offsets first
+    bytes of each line are considered.
+    """
+
+    def __init__(self, threshold=0.01, ngram=2, max_offsets=4096):
+        if not 1 <= ngram <= 4:
+            raise ValueError("n-grams must be 1 to 4 bytes long")
+        self.threshold = threshold
+        self.ngram = ngram
+        self.max_offsets = max_offsets
+        self.hist = np.zeros((max_offsets, 256), dtype=np.int64)
+        # number of lines holding each offset
+        self.totals = np.zeros(max_offsets, dtype=np.int64)
+        self.sketch = CountMinSketch()
+
+    def _keys(self, a):
+        """Returns the (offset, n-gram) keys of the n-grams of @a."""
+        n = len(a) - self.ngram + 1
+        if n <= 0:
+            return np.zeros(0, dtype=np.int64)
+        gram = np.zeros(n, dtype=np.int64)
+        for k in range(self.ngram):
+            gram = (gram << 8) | a[k:k + n]
+        return gram * self.max_offsets + np.arange(n)
+
+    def update(self, data):
+        """Counts the bytes of a line (str)."""
+        a = np.frombuffer(data[:self.max_offsets], dtype=np.uint8)
+        self.hist[np.arange(len(a)), a] += 1
+        self.totals[:len(a)] += 1
+        self.sketch.add(self._keys(a))
+
+    def rare(self, data):
+        """Returns a numpy bool array telling which bytes of a line (str) are
+        rare (False past max_offsets)."""
+        rare = np.zeros(len(data), dtype=bool)
+        a = np.frombuffer(data[:self.max_offsets], dtype=np.uint8)
+        l = len(a)
+        totals = self.totals[:l]
+        limit = self.threshold * totals
+        rare[:l] = self.hist[np.arange(l), a] < limit
+        keys = self._keys(a)
+        if len(keys):
+            # an n-gram is held by the lines holding its last byte
+            grams = self.sketch.query(keys) < limit[self.ngram - 1:]
+            # n-grams are only telling when made of usual bytes
+            for k in range(self.ngram):
+                grams &= ~rare[k:k + len(grams)]
+            for k in range(self.ngram):
+                rare[k:k + len(grams)] |= grams
+        return rare
@@ -0,0 +1,78 @@
+import os
+import random
+
+
+def sample_lines(lines, size, seed=0, keep=None):
+    """Reservoir sampling: returns (indexes, samples), @size items drawn
+    uniformly from the iterable @lines, in a single pass. Only items for which
+    @keep (if given) returns True are drawn, indexes counting all items."""
+    rng = random.Random(seed)
+    indexes, samples = [], []
+    seen = 0
+    for i, line in enumerate(lines):
+        if keep is not None and not keep(line):
+            continue
+        if seen < size:
+            indexes.append(i)
+            samples.append(line)
+        else:
+            j = rng.randint(0, seen)
+            if j < size:
+                indexes[j] = i
+                samples[j] = line
+        seen += 1
+    return indexes, samples
+
+
+def reservoir_sample(lines, size, keep=None):
+    """Yields @size lines drawn uniformly from @lines (see sample_lines), in
+    their original order."""
+    indexes, samples = sample_lines(lines, size, keep=keep)
+    for _, line in sorted(zip(indexes, samples)):
+        yield line
+
+
+def stride_sample(f, size, keep=None):
+    """Yields about @size lines evenly spread over the seekable file @f,
+    without reading the rest of it: the first line starting after each of
+    @size evenly spaced offsets is taken. If @keep is given, the first line
+    for which it returns True is taken instead, up to the next offset.
+
+    Lines are spread by bytes: long lines are more likely to be drawn.
+    """
+    f.seek(0, os.SEEK_END)
+    end = f.tell()
+    last = -1
+    for k in range(size):
+        pos = k * end // size
+        stop = (k + 1) * end // size
+        if pos > 0:
+            # skip the end of the line containing pos - 1
+            f.seek(pos - 1)
+            f.readline()
+        else:
+            f.seek(0)
+        while f.tell() < stop:
+            offset = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            if offset > last and (keep is None or keep(line)):
+                last = offset
+                yield line
+                break
+
+
+def per_header(lines, header, size, keep=None):
+    """Yields the @size first lines of @lines for each distinct value of
+    @header(line). If @keep is given, only lines for which it returns True are
+    considered."""
+    counts = {}
+    for line in lines:
+        if keep is not None and not keep(line):
+            continue
+        h = header(line)
+        n = counts.get(h, 0)
+        if n < size:
+            counts[h] = n + 1
+            yield line
@@ -107,6 +107,8 @@ class TermRenderer(Renderer):
 
     def _print_rule(self):
         start = 0
+        if conf.columns and conf.columns[0]:
+            start = conf.columns[0]
         max_dump_width = conf.disp_width - self.shift
         max_bytes = max_dump_width // encoding2len[conf.enc]
 
@@ -114,6 +116,6 @@ class TermRenderer(Renderer):
         for i in xrange(self.max_len//max_bytes + 1):
             out.append(build_rule(max_bytes, self.shift,
                                   encoding2len[conf.enc],
-                                  start=i*max_bytes))
+                                  start=start + i*max_bytes))
         print('\n'.join(out))
 
@@ -0,0 +1,175 @@
+import binascii
+
+import numpy as np
+
+
+def _int_arg(arg, default):
+    """Returns the int value of the transform argument @arg, @default if it
+    is not given, or None if it is not an int."""
+    if not arg:
+        return default
+    try:
+        return int(arg)
+    except ValueError:
+        return None
+
+
+class Transform(object):
+    """Base class. Child classes derive a new view of a line of bytes (e.g.
+    XOR with a key), working on whole numpy buffers at once.
+
+    Transforms keep the length of the line so that offsets given to the other
+    options (start, highlight, filter...) stay meaningful.
+    """
+
+    name = None
+    help = ""
+
+    def __init__(self, arg=None):
+        self.arg = arg
+
+    def apply(self, data, ref):
+        """Transforms the bytes of a line.
+
+        Args:
+            @data: a uint8 numpy array, the bytes of the line
+            @ref: a uint8 numpy array, the raw bytes of the reference line (the
+                one diffed with), or None
+
+        Return:
+            a uint8 numpy array of the same length as @data
+        """
+        raise NotImplementedError("Abstract method")
+
+
+class RefTransform(Transform):
+    """Base class for transforms combining a line with its reference. Bytes
+    beyond the end of the reference are left unchanged."""
+
+    def apply(self, data, ref):
+        if ref is None:
+            return data
+        l = min(len(data), len(ref))
+        out = data.copy()
+        out[:l] = self.combine(data[:l], ref[:l])
+        return out
+
+    def combine(self, data, ref):
+        raise NotImplementedError("Abstract method")
+
+
+class XorRef(RefTransform):
+    name = "xor-ref"
+    help = "XOR with the reference line"
+
+    def combine(self, data, ref):
+        return data ^ ref
+
+
+class SubRef(RefTransform):
+    name = "sub-ref"
+    help = "subtracts the reference line (mod 256)"
+
+    def combine(self, data, ref):
+        return data - ref
+
+
+class XorKey(Transform):
+    name = "xor-key"
+    help = "XOR with a repeating key, e.g. xor-key:a5c3"
+
+    def __init__(self, arg=None):
+        super(XorKey, self).__init__(arg)
+        try:
+            key = binascii.unhexlify(arg or "")
+        except TypeError:
+            key = ""
+        if not key:
+            raise ValueError("xor-key needs a hex key, e.g. xor-key:a5c3")
+        self.key = np.frombuffer(key, dtype=np.uint8)
+
+    def apply(self, data, ref):
+        return data ^ np.resize(self.key, len(data))
+
+
+class Delta(Transform):
+    name = "delta"
+    help = "difference with the previous byte (mod 256)"
+
+    def apply(self, data, ref):
+        out = data.copy()
+        out[1:] -= data[:-1]
+        return out
+
+
+class Swap(Transform):
+    name = "swap"
+    help = "reverses the bytes of each @arg-byte word (default 2), e.g. swap:4"
+
+    def __init__(self, arg=None):
+        super(Swap, self).__init__(arg)
+        self.size = _int_arg(arg, 2)
+        if self.size is None or self.size < 1:
+            raise ValueError("swap needs a positive word size, e.g. swap:4")
+
+    def apply(self, data, ref):
+        out = data.copy()
+        l = len(data) - len(data) % self.size
+        words = out[:l].reshape(-1, self.size)
+        words[:] = words[:, ::-1]
+        return out
+
+
+class BitPlane(Transform):
+    name = "bit"
+    help = "keeps bit @arg (0 is the least significant) of each byte: bit:7"
+
+    def __init__(self, arg=None):
+        super(BitPlane, self).__init__(arg)
+        self.bit = _int_arg(arg, 0)
+        if self.bit is None or not 0 <= self.bit < 8:
+            raise ValueError("bit needs a bit index from 0 to 7, e.g. bit:7")
+
+    def apply(self, data, ref):
+        return (data >> self.bit) & 1
+
+
+name2transform = dict((t.name, t) for t in
+                      [XorRef, SubRef, XorKey, Delta, Swap, BitPlane])
+
+
+class TransformChain(object):
+    """A sequence of Transforms applied one after the other."""
+
+    def __init__(self):
+        self.transforms = []
+
+    def add_transform(self, spec):
+        """Appends a transform to this chain.
+
+        Args:
+            @spec: a str of the following form: name[:arg], name being one of
+                name2transform's keys (e.g. "xor-key:a5c3" or "delta").
+        """
+        name, _, arg = spec.partition(":")
+        if name not in name2transform:
+            raise ValueError("Unknown transform: %s (available: %s)"
+                             % (name, ", ".join(sorted(name2transform))))
+        self.transforms.append(name2transform[name](arg or None))
+
+    def add_transforms(self, spec_list):
+        """Appends a list of transforms to this chain. See add_transform doc for
+        the syntax."""
+        for spec in spec_list:
+            self.add_transform(spec)
+
+    def apply(self, data, ref=None):
+        """Applies the chain to @data (a str) with @ref the raw bytes (str) of
+        the reference line, and @return the result as a str."""
+        if not self.transforms:
+            return data
+        a = np.frombuffer(data, dtype=np.uint8)
+        r = np.frombuffer(ref, dtype=np.uint8) if ref is not None else None
+        for t in self.transforms:
+            a = t.apply(a, r)
+        return a.astype(np.uint8).tobytes()
@@ -0,0 +1,96 @@
+import binascii
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+# hexlighter.conf parses the command line when imported
+sys.argv = sys.argv[:1]
+
+from hexlighter import conf, main
+from hexlighter.cluster import Clusterer, distances, prefix_matrix
+
+
+def message_types(count, seed=0):
+    """Returns @count random message templates (uint8 arrays) of 20 to 60
+    bytes."""
+    rng = np.random.RandomState(seed)
+    return [rng.randint(0, 256, rng.randint(20, 60)).astype(np.uint8)
+            for _ in range(count)]
+
+
+def mutate(template, rng, rate=0.05):
+    a = template.copy()
+    noisy = rng.rand(len(a)) < rate
+    a[noisy] = rng.randint(0, 256, noisy.sum())
+    return a.tobytes()
+
+
+def cluster_file(lines):
+    """Runs cluster_lines on a temporary file holding @lines (str)."""
+    f = tempfile.TemporaryFile()
+    f.write("".join(line + "\n" for line in lines))
+    return main.cluster_lines(f)
+
+
+class DistanceTest(unittest.TestCase):
+
+    def test_length_beyond_prefix(self):
+        short, long_ = "\x01" * 200, "\x01" * 1000
+        matrix, lengths = prefix_matrix([short, long_, long_], 64)
+        self.assertEqual(list(lengths), [200, 1000, 1000])
+        d = distances(matrix[:2], lengths[:2], matrix[1:], lengths[1:])
+        self.assertAlmostEqual(d[0], 800. / 864)
+        self.assertEqual(d[1], 0)
+
+    def test_differing_bytes_of_long_lines(self):
+        matrix, lengths = prefix_matrix(["\x00" * 1000, "\x01" * 1000], 64)
+        d = distances(matrix[:1], lengths[:1], matrix[1:], lengths[1:])
+        self.assertEqual(d[0], 1)
+
+
+class ClustererTest(unittest.TestCase):
+
+    def test_distinct_types(self):
+        rng = np.random.RandomState(1)
+        templates = message_types(8)
+        types = rng.randint(len(templates), size=2000)
+        lines = [mutate(templates[t], rng) for t in types]
+        clusterer = Clusterer()
+        clusterer.fit(range(len(lines)), lines)
+        self.assertEqual(len(clusterer.medoids), len(templates))
+        cluster, _ = clusterer.assign(*prefix_matrix(lines, 64))
+        self.assertTrue((cluster >= 0).all())
+        for t in range(len(templates)):
+            self.assertEqual(len(set(cluster[types == t])), 1)
+        self.assertEqual(len(set(cluster)), len(templates))
+
+    def test_same_prefix_different_lengths(self):
+        prefix = "\x42" * 64
+        lines = [binascii.hexlify(prefix + "\x00" * (n - 64))
+                 for n in [200, 1000] * 500]
+        clusterer, _, cluster = cluster_file(lines)
+        self.assertEqual(len(clusterer.medoids), 2)
+        self.assertEqual(len(set(cluster[::2])), 1)
+        self.assertEqual(len(set(cluster[1::2])), 1)
+        self.assertNotEqual(cluster[0], cluster[1])
+
+    def test_empty_lines_are_not_clustered(self):
+        lines = ["0102030405", "", "comment", "0102030405"] * 10
+        clusterer, _, cluster = cluster_file(lines)
+        self.assertEqual(len(clusterer.medoids), 1)
+        self.assertEqual(list(cluster[:4]), [0, -1, -1, 0])
+
+    def test_max_clusters(self):
+        rng = np.random.RandomState(2)
+        lines = [mutate(t, rng) for t in message_types(50, seed=3)]
+        clusterer = Clusterer(max_clusters=10)
+        clusterer.fit(range(len(lines)), lines)
+        self.assertEqual(len(clusterer.medoids), 10)
+        new = message_types(1, seed=4)[0].tobytes()
+        self.assertEqual(clusterer.add_outlier(len(lines), new), -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
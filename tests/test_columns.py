@@ -0,0 +1,80 @@
+import binascii
+import random
+import sys
+import unittest
+
+# hexlighter.conf parses the command line when imported
+sys.argv = sys.argv[:1]
+
+from hexlighter import conf
+from hexlighter.core import CommentedHexDecoder
+
+
+def processed(line, ref=None):
+    """Returns the (value, highlight, diff) of each processed byte of @line
+    (hex), diffed with @ref (hex) if given, or None for the bytes added by the
+    alignment: they are all the same NoByte object, so they share their
+    flags."""
+    decoder = CommentedHexDecoder()
+    rbl = decoder.decode(line)
+    if ref is not None:
+        rbl.ref = decoder.decode(ref)
+        rbl.ref.get_bytes()
+    return [(b.value, bool(b.highlight), b.is_diff())
+            if b.value is not None else None for b in rbl.get_bytes()]
+
+
+class ParseColumnsTest(unittest.TestCase):
+
+    def test_bounds(self):
+        self.assertEqual(conf.parse_columns("2:5"), (2, 5))
+        self.assertEqual(conf.parse_columns(":5"), (None, 5))
+        self.assertEqual(conf.parse_columns("2:"), (2, None))
+        self.assertEqual(conf.parse_columns("3:3"), (3, 3))
+
+    def test_bad_windows(self):
+        for spec in ("5", "-1:3", "5:2", "a:b"):
+            self.assertRaises(ValueError, conf.parse_columns, spec)
+
+
+class ColumnWindowTest(unittest.TestCase):
+    """Processing only the column window gives the same bytes as slicing the
+    processing of the whole line."""
+
+    names = ("start", "width", "align", "highlight", "cycle", "columns")
+
+    def setUp(self):
+        self.saved = [getattr(conf, name) for name in self.names]
+
+    def tearDown(self):
+        for name, value in zip(self.names, self.saved):
+            setattr(conf, name, value)
+
+    def random_line(self, rng):
+        return binascii.hexlify("".join(chr(rng.randint(0, 255))
+                                        for _ in range(rng.randint(0, 40))))
+
+    def test_random_windows(self):
+        rng = random.Random(0)
+        for _ in range(3000):
+            line, ref = self.random_line(rng), self.random_line(rng)
+            conf.start = rng.choice([0, 0, rng.randint(0, 10)])
+            conf.width = rng.choice([None, rng.randint(1, 40)])
+            conf.align = rng.choice([None, [rng.randint(-10, 10),
+                                            rng.randint(0, 50)]])
+            conf.highlight = rng.choice([None, [rng.randint(0, 20),
+                                                rng.randint(1, 5)]])
+            conf.cycle = rng.choice([None, rng.randint(1, 12)])
+            first = rng.choice([None, rng.randint(0, 50)])
+            last = rng.choice([None, rng.randint(first or 0, 60)])
+            conf.columns = None
+            whole = processed(line, ref)
+            conf.columns = (first, last)
+            window = processed(line, ref)
+            self.assertEqual(window, whole[first:last],
+                             (line, ref, conf.start, conf.width, conf.align,
+                              conf.highlight, conf.cycle, conf.columns))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import binascii
+import struct
+import sys
+import unittest
+
+import numpy as np
+
+# hexlighter.conf parses the command line when imported
+sys.argv = sys.argv[:1]
+
+from hexlighter import conf
+from hexlighter.core import CommentedHexDecoder
+from hexlighter.fields import FieldDetector, checksums
+
+
+def framed(payload):
+    """Returns a message: a 0xaa marker, the u16 be length of @payload,
+    @payload and the u32 le crc32 of all of it."""
+    body = "\xaa" + struct.pack(">H", len(payload)) + payload
+    return body + struct.pack("<I", binascii.crc32(body) & 0xffffffff)
+
+
+class ChecksumTest(unittest.TestCase):
+
+    check = {
+        "crc8": 0xf4,
+        "crc16-arc": 0xbb3d,
+        "crc16-modbus": 0x4b37,
+        "crc16-ccitt": 0x29b1,
+        "crc16-xmodem": 0x31c3,
+        "crc32": 0xcbf43926,
+    }
+
+    def test_check_values(self):
+        for c in checksums:
+            if c.name in self.check:
+                self.assertEqual(c.compute("123456789"), self.check[c.name],
+                                 c.name)
+
+
+class FieldDetectorTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.detector = FieldDetector()
+        for _ in range(300):
+            n = rng.randint(10, 40)
+            self.detector.add(framed(rng.randint(0, 256, n)
+                                     .astype(np.uint8).tobytes()))
+
+    def test_length_field(self):
+        fields = [(f.offset, f.width, f.endian, f.delta)
+                  for f in self.detector.length_fields()]
+        self.assertIn((1, 2, '>', -7), fields)
+
+    def test_crc32_trailer(self):
+        fields = [(f.checksum.name, f.endian, f.offset, f.start, f.end)
+                  for f in self.detector.checksum_fields()]
+        self.assertIn(("crc32", '<', -4, 0, -4), fields)
+
+
+class HighlightFieldsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = (conf.align, conf.start, conf.highlight_fields)
+
+    def tearDown(self):
+        conf.align, conf.start, conf.highlight_fields = self.saved
+
+    def highlit(self, fields, line="616263646566"):
+        conf.highlight_fields = fields
+        rbl = CommentedHexDecoder().decode(line)
+        return "".join(b.value for b in rbl.get_bytes() if b.highlight)
+
+    def test_align(self):
+        conf.align = [0, 10]
+        self.assertEqual(self.highlit([(-2, 2), (0, 1)]), "aef")
+
+    def test_field_split_by_align(self):
+        conf.align = [2, 10]
+        self.assertEqual(self.highlit([(1, 2)]), "bc")
+
+    def test_start(self):
+        conf.start = 1
+        self.assertEqual(self.highlit([(-2, 2), (0, 2)]), "bef")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+import numpy as np
+
+from hexlighter.period import PeriodDetector
+
+
+def tiled(period, length, noise=0.0, seed=0):
+    """Returns @length bytes (str) repeating a random @period-byte record,
+    with a @noise proportion of random bytes."""
+    rng = np.random.RandomState(seed)
+    a = np.resize(rng.randint(0, 256, period).astype(np.uint8), length)
+    noisy = rng.rand(length) < noise
+    a[noisy] = rng.randint(0, 256, noisy.sum())
+    return a.tobytes()
+
+
+class PeriodDetectorTest(unittest.TestCase):
+
+    def test_long_tiled_line(self):
+        for length in (600, 12000, 60000):
+            report = PeriodDetector().add(tiled(12, length))
+            self.assertEqual(report.best()[0], 12)
+
+    def test_noisy_multi_megabyte_line(self):
+        report = PeriodDetector().add(tiled(37, 4 << 20, noise=0.1))
+        self.assertEqual(report.best()[0], 37)
+
+    def test_long_line_does_not_outvote_short_lines(self):
+        detector = PeriodDetector()
+        for seed in range(100):
+            detector.add(tiled(37, 740, noise=0.05, seed=seed))
+        detector.add(np.random.RandomState(1).randint(0, 256, 360000)
+                     .astype(np.uint8).tobytes())
+        period, _, _, lines = detector.aggregate().best()
+        self.assertEqual((period, lines), (37, 100))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+import numpy as np
+
+from hexlighter.rarity import CountMinSketch, RarityModel
+
+
+class CountMinSketchTest(unittest.TestCase):
+
+    def test_never_underestimates(self):
+        sketch = CountMinSketch(width=64)
+        keys = np.arange(1000, dtype=np.int64)
+        sketch.add(keys)
+        sketch.add(keys[:10])
+        counts = sketch.query(keys)
+        self.assertTrue((counts[:10] >= 2).all())
+        self.assertTrue((counts >= 1).all())
+
+
+class RarityModelTest(unittest.TestCase):
+
+    def setUp(self):
+        # offsets 0-1 hold "ab" or "cd", offset 2 is always 0
+        self.model = RarityModel(threshold=0.05, ngram=2)
+        for i in range(200):
+            self.model.update(("ab", "cd")[i % 2] + "\x00")
+
+    def rare(self, line):
+        return list(np.flatnonzero(self.model.rare(line)))
+
+    def test_usual_line(self):
+        self.assertEqual(self.rare("ab\x00"), [])
+        self.assertEqual(self.rare("cd\x00"), [])
+
+    def test_single_odd_byte(self):
+        self.assertEqual(self.rare("ab\x01"), [2])
+
+    def test_rare_ngram_of_usual_bytes(self):
+        self.assertEqual(self.rare("ad\x00"), [0, 1])
+
+    def test_unigrams_only(self):
+        model = RarityModel(threshold=0.05, ngram=1)
+        for i in range(200):
+            model.update(("ab", "cd")[i % 2])
+        self.assertEqual(list(np.flatnonzero(model.rare("ad"))), [])
+
+    def test_beyond_max_offsets(self):
+        model = RarityModel(max_offsets=2)
+        model.update("abc")
+        self.assertEqual(list(model.rare("xyz")), [True, True, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import tempfile
+import unittest
+
+from hexlighter.sampling import (sample_lines, reservoir_sample,
+                                 stride_sample, per_header)
+
+
+def numbered_file(count):
+    """Returns a temporary file of @count lines "0000" to "%04d"."""
+    f = tempfile.TemporaryFile()
+    f.write("".join("%04d\n" % i for i in range(count)))
+    f.seek(0)
+    return f
+
+
+def is_odd(line):
+    return int(line) % 2 == 1
+
+
+class StrideSampleTest(unittest.TestCase):
+
+    def test_evenly_spread(self):
+        lines = list(stride_sample(numbered_file(100), 10))
+        self.assertEqual([int(l) for l in lines], list(range(0, 100, 10)))
+
+    def test_keep(self):
+        lines = list(stride_sample(numbered_file(100), 10, is_odd))
+        self.assertEqual([int(l) for l in lines], list(range(1, 100, 10)))
+
+    def test_no_line_twice(self):
+        lines = list(stride_sample(numbered_file(5), 20))
+        self.assertEqual([int(l) for l in lines], list(range(5)))
+
+    def test_keep_rejects_everything(self):
+        self.assertEqual(list(stride_sample(numbered_file(10), 3,
+                                            lambda line: False)), [])
+
+
+class PerHeaderTest(unittest.TestCase):
+
+    lines = ["a1", "b1", "a2", "a3", "b2", "c1", "b3"]
+
+    def test_first_lines_of_each_header(self):
+        self.assertEqual(list(per_header(self.lines, lambda l: l[0], 2)),
+                         ["a1", "b1", "a2", "b2", "c1"])
+
+    def test_keep(self):
+        keep = lambda line: line != "a1"
+        self.assertEqual(list(per_header(self.lines, lambda l: l[0], 1, keep)),
+                         ["b1", "a2", "c1"])
+
+
+class ReservoirSampleTest(unittest.TestCase):
+
+    def test_sample_in_order(self):
+        lines = list(reservoir_sample(("%04d" % i for i in range(1000)), 10))
+        self.assertEqual(len(lines), 10)
+        self.assertEqual(lines, sorted(lines))
+
+    def test_keep_and_indexes(self):
+        lines = ["%04d" % i for i in range(100)]
+        indexes, sample = sample_lines(lines, 10, keep=is_odd)
+        self.assertEqual(len(sample), 10)
+        for i, line in zip(indexes, sample):
+            self.assertEqual(lines[i], line)
+            self.assertTrue(is_odd(line))
+
+
+if __name__ == '__main__':
+    unittest.main()
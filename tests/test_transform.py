@@ -0,0 +1,98 @@
+import binascii
+import os
+import sys
+import unittest
+
+# hexlighter.conf parses the command line when imported
+sys.argv = sys.argv[:1]
+
+from hexlighter import conf, main
+from hexlighter.core import Renderer
+from hexlighter.transform import TransformChain
+
+samples = os.path.join(os.path.dirname(__file__), "..", "samples")
+
+
+def transform(specs, data, ref=None):
+    """Applies the chain of @specs to @data (hex) with @ref (hex) as the
+    reference line and @return the result in hex."""
+    chain = TransformChain()
+    chain.add_transforms(specs)
+    ref = binascii.unhexlify(ref) if ref is not None else None
+    return binascii.hexlify(chain.apply(binascii.unhexlify(data), ref))
+
+
+class TransformTest(unittest.TestCase):
+
+    def test_ref_transforms(self):
+        self.assertEqual(transform(["xor-ref"], "010203", "0100"), "000203")
+        self.assertEqual(transform(["sub-ref"], "0501", "0302"), "02ff")
+        self.assertEqual(transform(["xor-ref"], "010203"), "010203")
+
+    def test_xor_key_shorter_than_line(self):
+        self.assertEqual(transform(["xor-key:a5c3"], "0000000001"),
+                         "a5c3a5c3a4")
+
+    def test_delta(self):
+        self.assertEqual(transform(["delta"], "01030602"), "010203fc")
+
+    def test_swap_partial_last_word(self):
+        self.assertEqual(transform(["swap"], "0102030405"), "0201040305")
+        self.assertEqual(transform(["swap:4"], "010203040506"),
+                         "040302010506")
+
+    def test_bit_plane(self):
+        self.assertEqual(transform(["bit:7"], "807fff"), "010001")
+        self.assertEqual(transform(["bit"], "807fff"), "000101")
+
+    def test_chain_order(self):
+        self.assertEqual(transform(["delta", "bit:0"], "01030602"),
+                         "01000100")
+
+    def test_bad_specs(self):
+        for spec in ("foo", "xor-key", "xor-key:zz", "swap:0", "swap:x",
+                     "bit:9"):
+            self.assertRaises(ValueError, TransformChain().add_transform,
+                              spec)
+
+    def test_parse_transforms(self):
+        chain = conf.parse_transforms("delta,bit:0")
+        self.assertEqual([t.name for t in chain.transforms], ["delta", "bit"])
+        self.assertEqual(conf.parse_transforms("").transforms, [])
+
+
+class CollectingRenderer(Renderer):
+
+    lines = []
+
+    def render(self, ebl):
+        if ebl.get_encoded_byte_list():
+            CollectingRenderer.lines.append(ebl.rbl)
+
+
+class RefTransformFilterTest(unittest.TestCase):
+    """Reference transforms use the previous decoded line, even if it is
+    filtered out."""
+
+    def setUp(self):
+        self.saved = (conf.file, conf.transform, conf.filter,
+                      main.renderer2class["term"])
+        conf.file = os.path.join(samples, "function_output.hex")
+        conf.transform = conf.parse_transforms("xor-ref")
+        conf.filter = ["0=00"]
+        main.renderer2class["term"] = CollectingRenderer
+        CollectingRenderer.lines = []
+
+    def tearDown(self):
+        (conf.file, conf.transform, conf.filter,
+         main.renderer2class["term"]) = self.saved
+
+    def test_filter_on_transformed_bytes(self):
+        main.main()
+        self.assertTrue(CollectingRenderer.lines)
+        for rbl in CollectingRenderer.lines:
+            self.assertEqual(rbl.get_bytes()[0].value, "\x00")
+
+
+if __name__ == '__main__':
+    unittest.main()